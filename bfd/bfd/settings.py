@@ -50,6 +50,7 @@ SOFTWARE.
 """
 
 import os
+import sys
 import uuid
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -65,6 +66,9 @@ SECRET_KEY = os.environ.get("BFD_KEY", "SECRET_KEY")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = bool(os.environ.get("BFD_DEBUG", False))
 
+# True when the test suite is being run via "python manage.py test".
+TESTING = sys.argv[1:2] == ["test"]
+
 # SECURITY WARNING: the UUID must remain the same for all instances.
 BFD_UUID = uuid.UUID(
     os.environ.get("BFD_UUID", "431bb0cd-e9cb-41c2-bfb2-b6c19c89f676")
@@ -153,6 +157,15 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing is deliberately slow. The test suite creates many users, so
+# it uses a fast (and insecure) hasher instead.
+# https://docs.djangoproject.com/en/3.0/topics/testing/overview/#password-hashing
+
+if TESTING:
+    PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
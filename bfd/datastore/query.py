@@ -43,9 +43,12 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+import re
 import structlog  # type: ignore
-from datetime import timedelta
-from typing import Set, Union
+from datetime import datetime, timedelta, tzinfo
+from datetime import timezone as datetime_timezone
+from functools import lru_cache
+from typing import Dict, Optional, Set, Union
 from sly import Lexer, Parser  # type: ignore
 from dateutil.parser import parse as datetime_parser  # type: ignore
 from django.db.models import Q  # type: ignore
@@ -56,14 +59,109 @@ from datastore import models
 logger = structlog.get_logger()
 
 
+#: Maps the case-folded keywords of the query language to their token names.
+KEYWORDS: Dict[str, str] = {
+    "has": "HAS",
+    "missing": "MISSING",
+    "and": "AND",
+    "or": "OR",
+    "matches": "MATCHES",
+    "imatches": "IMATCHES",
+    "is": "IS",
+    "iis": "IIS",
+}
+
+
+#: Maps the case-folded boolean words of the query language to their values.
+BOOLEANS: Dict[str, bool] = {
+    "true": True,
+    "false": False,
+}
+
+
+#: Captures the parts of the datetimes described in the W3C's note on datetime
+#: formats (https://www.w3.org/TR/NOTE-datetime).
+DATETIME_PARTS = re.compile(
+    r"(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})"
+    r"(?:T(?P<hour>\d{2}):(?P<minute>\d{2}):(?P<second>\d{2})"
+    r"(?P<tz>Z|(?P<sign>[+-])(?P<tz_hour>\d{2}):(?P<tz_minute>\d{2}))?)?"
+)
+
+
+@lru_cache(maxsize=1024)
+def _parse_datetime(value: str) -> datetime:
+    """
+    Parse the string representation of a datetime found in a query.
+
+    The parts of the expected shapes of datetime are captured by a regular
+    expression and turned straight into a datetime instance, with the
+    standard library's fixed offset timezones for explicit UTC offsets.
+    Anything else falls back to dateutil's (much slower) general purpose
+    parser.
+
+    Queries often contain the same datetime literals, so results are cached.
+    Timezone information is not added to datetimes without it (that depends
+    upon Django's current timezone) so the cache remains correct if the
+    timezone changes.
+    """
+    match = DATETIME_PARTS.fullmatch(value)
+    if not match:
+        return datetime_parser(value)
+    year, month, day = (
+        int(part) for part in match.group("year", "month", "day")
+    )
+    if match["hour"] is None:
+        # Just the date.
+        return datetime(year, month, day)
+    hour, minute, second = (
+        int(part) for part in match.group("hour", "minute", "second")
+    )
+    tz: Optional[tzinfo] = None
+    if match["tz"] == "Z":
+        # "Zulu" time denotes UTC.
+        tz = datetime_timezone.utc
+    elif match["tz"]:
+        offset = timedelta(
+            hours=int(match["tz_hour"]), minutes=int(match["tz_minute"])
+        )
+        if match["sign"] == "-":
+            offset = -offset
+        tz = datetime_timezone(offset)
+    return datetime(year, month, day, hour, minute, second, tzinfo=tz)
+
+
+@lru_cache(maxsize=1024)
+def _make_aware(value: datetime, tz: tzinfo) -> datetime:
+    """
+    Make the naive datetime value aware of the referenced timezone (usually
+    Django's current timezone). Localizing a datetime is relatively
+    expensive, so results are cached for each datetime and timezone.
+    """
+    return timezone.make_aware(value, tz)
+
+
 class QueryLexer(Lexer):
     """
     A simple Sly based lexer for the query language.
+
+    Sly joins the token rules defined below (in the order they appear) into a
+    single master regular expression of named groups. This is compiled once,
+    when the class is created, rather than each time the class is
+    instantiated. Tokenizing is therefore a single regex match per token.
     """
 
     def __init__(self):
         super().__init__()
-        self.tag_paths = set()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Reset the state of the lexer so the instance can be reused to tokenize
+        another query.
+        """
+        # Each unique tag path referenced in the query.
+        self.tag_paths: Set[str] = set()
+        self.lineno = 1
 
     tokens = {
         PATH,  # type: ignore # noqa
@@ -104,9 +202,9 @@ class QueryLexer(Lexer):
         information, a timezone is added based on the current Django timezone
         configuration.
         """
-        dt = datetime_parser(t.value)
+        dt = _parse_datetime(t.value)
         if not dt.tzinfo:
-            dt = timezone.make_aware(dt)
+            dt = _make_aware(dt, timezone.get_current_timezone())
         t.value = dt
         return t
 
@@ -127,54 +225,47 @@ class QueryLexer(Lexer):
         self.tag_paths.add(t.value)
         return t
 
-    # Floats must come before integers.
-    @_(r"-?\d+\.\d+(e-?\d+)?")  # type: ignore
-    def FLOAT(self, t):
-        """
-        Real numbers (expressed as floating point).
-        """
-        t.value = float(t.value)
-        return t
-
-    @_(r"[\d]+[s|d]{1}")  # type: ignore
-    def DURATION(self, t):
-        """
-        A duration, resolves to a Python timedelta.
-        """
-        amount = int(t.value[:-1])
-        if t.value.endswith("d"):
-            # Timedelta of days.
-            t.value = timedelta(days=amount)
+    # Integers, floats and durations all start with digits, so they share a
+    # single rule (rather than three alternatives each tried in turn) and the
+    # type of token is worked out from the matched text.
+    @_(r"-?\d+(\.\d+(e-?\d+)?|[sd])?")  # type: ignore
+    def NUMBER(self, t):
+        """
+        Real numbers (expressed as floating point) resolve to a Python float.
+
+        A duration, an integer followed by "d" (days) or "s" (seconds),
+        resolves to a Python timedelta. Durations cannot be negative.
+
+        Anything else is an integer.
+        """
+        value = t.value
+        unit = value[-1]
+        if unit == "d" or unit == "s":
+            if value[0] == "-":
+                self.error(t)
+            t.type = "DURATION"
+            amount = int(value[:-1])
+            if unit == "d":
+                # Timedelta of days.
+                t.value = timedelta(days=amount)
+            else:
+                # Timedelta of seconds.
+                t.value = timedelta(seconds=amount)
+        elif "." in value:
+            t.type = "FLOAT"
+            t.value = float(value)
         else:
-            # Timedelta of seconds.
-            t.value = timedelta(seconds=amount)
-        return t
-
-    @_(r"-?\d+")  # type: ignore
-    def INT(self, t):
-        """
-        Integers.
-        """
-        t.value = int(t.value)
+            t.type = "INT"
+            t.value = int(value)
         return t
 
-    @_(r"(?i)true")  # type: ignore
-    def TRUE(self, t):
-        """
-        True (boolean).
-        """
-        t.value = True
-        return t
-
-    @_(r"(?i)false")  # type: ignore
-    def FALSE(self, t):
-        """
-        False (boolean).
-        """
-        t.value = False
-        return t
+    # Sly joins all the rules into a single regex, in which global flags such
+    # as (?i) are only allowed at the very start (older versions of Python
+    # applied them to the whole regex, with a deprecation warning). So case
+    # insensitive matches use scoped (?i:...) groups, and every other rule is
+    # case sensitive.
 
-    @_(r"(?i)mime:(application|audio|font|example|image|message|model|multipart|text|video){1}/[-\.\w]+[\+\-\w]*")  # type: ignore # noqa
+    @_(r"(?i:mime:(application|audio|font|example|image|message|model|multipart|text|video){1})/[-\.\w]+[\+\-\w]*")  # type: ignore # noqa
     def MIME(self, t):
         """
         Remove the prepended "mime:"
@@ -194,14 +285,28 @@ class QueryLexer(Lexer):
         "(",
         ")",
     }
-    HAS = r"(?i)has"
-    MISSING = r"(?i)missing"
-    AND = r"(?i)and"
-    OR = r"(?i)or"
-    MATCHES = r"(?i)matches"
-    IMATCHES = r"(?i)imatches"
-    IS = r"(?i)is"
-    IIS = r"(?i)iis"
+
+    @_(r"[a-zA-Z]+")  # type: ignore
+    def KEYWORD(self, t):
+        """
+        Keywords and booleans are case insensitive. Rather than a case
+        insensitive regex for each of them, words are looked up in the
+        KEYWORDS dictionary to find the type of token (the value retains its
+        original case), or in the BOOLEANS dictionary to find the Python bool
+        they resolve to. Any other word, including keywords run together
+        without a space (such as "istrue"), is a syntax error naming the word.
+        """
+        word = t.value.casefold()
+        token_type = KEYWORDS.get(word)
+        if token_type:
+            t.type = token_type
+            return t
+        if word in BOOLEANS:
+            t.type = "TRUE" if BOOLEANS[word] else "FALSE"
+            t.value = BOOLEANS[word]
+            return t
+        raise SyntaxError(f"Unknown word: line {self.lineno}, word: {t.value}")
+
     NE = r"!="
     GE = r">="
     LE = r"<="
@@ -220,6 +325,10 @@ class QueryLexer(Lexer):
 class QueryParser(Parser):
     """
     Sly based parser for the query language.
+
+    Sly builds the LALR parsing tables from the grammar rules below once, when
+    the class is created. Instances only hold the tags referenced by a query
+    (checked for read permission by the given user) so are cheap to create.
     """
 
     tokens = QueryLexer.tokens
@@ -230,21 +339,19 @@ class QueryParser(Parser):
         super().__init__()
         # tagpaths are used to check read permissions for the query and
         # retrieve tag instances to use to get the result sets.
+        # All the readable tags are retrieved with a single database query.
         tags_to_read = models.get_readers_query(user, tag_paths)
-        self.tags = {}
-        for tag in tags_to_read:
-            # self.tags contains tag instances to use to create result sets
-            # from the database.
-            self.tags[tag.path] = tag
-        if len(tags_to_read) != len(tag_paths):
+        # self.tags contains tag instances to use to create result sets from
+        # the database.
+        self.tags = {tag.path: tag for tag in tags_to_read}
+        if len(self.tags) != len(tag_paths):
             # The user doesn't have permission to read certain tags, or the
             # referenced tags do not exist. So raise a value error referencing
             # the problem tags so the user has a clue where the problem may be
             # found.
-            missing_tags = []
-            for tag_path in tag_paths:
-                if tag_path not in self.tags:
-                    missing_tags.append(tag_path)
+            missing_tags = [
+                tag_path for tag_path in tag_paths if tag_path not in self.tags
+            ]
             raise ValueError(
                 "The following tags cannot be read: " + ", ".join(missing_tags)
             )
@@ -530,7 +637,7 @@ def evaluate(user: models.User, query: str) -> Set[str]:
             # Check tag read permissions.
             parser = QueryParser(user, lexer.tag_paths)
             # Parse.
-            result = parser.parse((t for t in tokens))
+            result = parser.parse(iter(tokens))
             logger.msg(
                 "Evaluate query.",
                 user=user.username,
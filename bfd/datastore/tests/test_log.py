@@ -41,11 +41,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 import platform
-from django.test import TestCase
+from django.test import SimpleTestCase
 from datastore import log
 
 
-class LogTestCase(TestCase):
+class LogTestCase(SimpleTestCase):
     """
     Tests relating to the structlog setup in the BFD.
     """
@@ -41,25 +41,107 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 from io import BytesIO
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from dateutil.tz import tzoffset, tzlocal
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.db.models import Q
 from django.core.files import uploadedfile
-from django.utils.timezone import make_aware
+from django.utils.timezone import make_aware, override
 from datastore import query
 from datastore import logic
 from datastore import models
 
 
-class QueryLexerTestCase(TestCase):
+def bulk_save(*annotations):
+    """
+    Save the referenced (unsaved) annotations with a single bulk insert for
+    each type of value.
+    """
+    by_type = defaultdict(list)
+    for annotation in annotations:
+        by_type[type(annotation)].append(annotation)
+    for value_type, instances in by_type.items():
+        value_type.objects.bulk_create(instances)
+
+
+#: Datetimes (and a timezone) used by the datetime lexer tests.
+DT_DATE = datetime(2020, 8, 19)
+DT_LOCAL = datetime(2020, 8, 19, 15, 40, 30)
+TZ_M0630 = timezone(timedelta(hours=-6, minutes=-30))
+DT_TZOFF = DT_LOCAL.replace(tzinfo=TZ_M0630)
+DT_UTC = DT_LOCAL.replace(tzinfo=timezone.utc)
+
+#: The query, and types of tag, used by the _evaluate_query tests.
+VALUE_CONTAINS_TEST = Q(value__contains="test")
+STRING_TYPES = frozenset({"string", "url"})
+NUMERIC_TYPES = frozenset({"int", "float", "datetime", "duration"})
+
+#: A lexer shared by the tests, its state is reset before each test.
+LEXER = query.QueryLexer()
+
+
+class QueryLexerTestCase(SimpleTestCase):
     """
     Tests relating to the regular expressions used to identify tokens in the
     lexing of the query.
     """
 
+    #: Keywords, which are matched case-insensitively.
+    KEYWORDS = (
+        "HAS",
+        "MISSING",
+        "AND",
+        "OR",
+        "MATCHES",
+        "IMATCHES",
+        "IS",
+        "IIS",
+    )
+
+    #: Comparison operators and the names of the tokens they evaluate to.
+    COMPARISONS = (
+        ("=", "EQ"),
+        ("!=", "NE"),
+        (">", "GT"),
+        ("<", "LT"),
+        (">=", "GE"),
+        ("<=", "LE"),
+    )
+
+    #: Literals, which evaluate to themselves.
+    LITERALS = ("(", ")")
+
+    #: Scalar values, the type of token and value they each evaluate to.
+    SCALARS = (
+        # A float is: 1.234 or -1.234 or 1.234e4
+        ("1.234", "FLOAT", 1.234),
+        ("-1.234", "FLOAT", -1.234),
+        ("1.234e4", "FLOAT", 1.234e4),
+        # A duration is an integer followed by a unit of measurement as days
+        # or seconds.
+        ("100d", "DURATION", timedelta(days=100)),
+        ("3600s", "DURATION", timedelta(seconds=3600)),
+        # An integer is: 1234 or -1234
+        ("1234", "INT", 1234),
+        ("-1234", "INT", -1234),
+        # Booleans are case insensitive.
+        ("True", "TRUE", True),
+        ("TRUE", "TRUE", True),
+        ("False", "FALSE", False),
+        ("FALSE", "FALSE", False),
+        ("tRuE", "TRUE", True),
+        ("fAlSe", "FALSE", False),
+    )
+
     def setUp(self):
-        self.lexer = query.QueryLexer()
+        LEXER.reset()
+        self.lexer = LEXER
+
+    def _first(self, example):
+        """
+        Return only the first token lexed from the example.
+        """
+        return next(self.lexer.tokenize(example))
 
     def test_datetime(self):
         """
@@ -74,32 +156,57 @@ class QueryLexerTestCase(TestCase):
         via Django's make_aware function to reflect configuration settings.
         """
         example = "2020-08-19"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
+        token = self._first(example)
         self.assertEqual(token.type, "DATETIME")
-        self.assertEqual(token.value, make_aware(datetime(2020, 8, 19)))
+        self.assertEqual(token.value, make_aware(DT_DATE))
         example = "2020-08-19T15:40:30"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
+        token = self._first(example)
         self.assertEqual(token.type, "DATETIME")
-        self.assertEqual(
-            token.value, make_aware(datetime(2020, 8, 19, 15, 40, 30))
-        )
+        self.assertEqual(token.value, make_aware(DT_LOCAL))
         example = "2020-08-19T15:40:30-06:30"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
+        token = self._first(example)
         self.assertEqual(token.type, "DATETIME")
-        self.assertEqual(
-            token.value,
-            datetime(2020, 8, 19, 15, 40, 30, tzinfo=tzoffset(None, -23400)),
-        )
+        self.assertEqual(token.value, DT_TZOFF)
+        self.assertEqual(token.value.tzinfo, TZ_M0630)
         example = "2020-08-19T15:40:30Z"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
+        token = self._first(example)
         self.assertEqual(token.type, "DATETIME")
-        self.assertEqual(
-            token.value, datetime(2020, 8, 19, 15, 40, 30, tzinfo=tzlocal())
-        )
+        self.assertEqual(token.value, DT_UTC)
+        self.assertEqual(token.value.tzinfo, timezone.utc)
+
+    def test_datetime_current_timezone(self):
+        """
+        Datetimes without timezone information are made aware of Django's
+        current timezone, even if the same datetime was previously lexed
+        when a different timezone was current.
+        """
+        example = "2020-08-19T15:40:30"
+        utc_token = self._first(example)
+        with override("Europe/London"):
+            london_token = self._first(example)
+            self.assertEqual(london_token.value, make_aware(DT_LOCAL))
+        self.assertEqual(utc_token.value, make_aware(DT_LOCAL))
+        self.assertNotEqual(london_token.value, utc_token.value)
+
+    def test_datetime_unknown_shape(self):
+        """
+        Datetimes of an unexpected shape fall back to dateutil's parser, which
+        raises a ValueError if it can't make sense of them.
+        """
+        with self.assertRaises(ValueError):
+            self._first("2020-08-19Z")
+
+    def test_datetime_cached(self):
+        """
+        Parsing the same datetime string more than once uses the cached
+        result.
+        """
+        query._parse_datetime.cache_clear()
+        example = "2020-08-19T15:40:30"
+        first = self._first(example)
+        second = self._first(example)
+        self.assertEqual(first.value, second.value)
+        self.assertEqual(query._parse_datetime.cache_info().hits, 1)
 
     def test_string(self):
         """
@@ -107,54 +214,30 @@ class QueryLexerTestCase(TestCase):
         """
         # Escaped comma.
         example = '"hello, world! \\" escaped. Don\'t forget \\\\ 汉字"'
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
+        token = self._first(example)
         self.assertEqual(token.type, "STRING")
         self.assertEqual(
             token.value, "hello, world! \\\" escaped. Don't forget \\\\ 汉字"
         )
         # Escaped double quote.
         example = '"hello, world! escaped. Don\'t forget \\\\ 汉字"'
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
+        token = self._first(example)
         self.assertEqual(token.type, "STRING")
         self.assertEqual(
             token.value, "hello, world! escaped. Don't forget \\\\ 汉字"
         )
 
-    def test_float(self):
-        """
-        A float is: 1.234 or -1.234 or 1.234e4
-        """
-        example = "1.234"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "FLOAT")
-        self.assertEqual(token.value, 1.234)
-        example = "-1.234"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "FLOAT")
-        self.assertEqual(token.value, -1.234)
-        example = "1.234e4"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "FLOAT")
-        self.assertEqual(token.value, 1.234e4)
-
     def test_path(self):
         """
         A path is: unicode-namespace-slug/unicode-tag-slug
         """
         example = "namespace-汉字-slug/tag_汉字_slug"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
+        token = self._first(example)
         self.assertEqual(token.type, "PATH")
         self.assertEqual(token.value, example)
         # Ensure all tag paths without duplications are logged in the lexer.
         example2 = "namespace/tag"
-        result = list(self.lexer.tokenize(example2))
-        token = result[0]
+        token = self._first(example2)
         self.assertEqual(token.type, "PATH")
         self.assertEqual(token.value, example2)
         list(self.lexer.tokenize(example))
@@ -179,74 +262,25 @@ class QueryLexerTestCase(TestCase):
         remaining valid mime type value.
         """
         example = "mime:image/jpeg"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
+        token = self._first(example)
         self.assertEqual(token.type, "MIME")
         self.assertEqual(token.value, "image/jpeg")
+        example = "MIME:application/vnd.oma.poc.optimized-progress-report+xml"
+        token = self._first(example)
+        self.assertEqual(token.type, "MIME")
+        self.assertEqual(token.value, example[5:])
 
-    def test_duration(self):
-        """
-        A duration is expressed as an integer followed by a unit of measurement
-        as days or seconds:
-
-        * 100d (100 days)
-        * 3600s (3600 seconds)
-        """
-        example = "100d"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "DURATION")
-        self.assertEqual(token.value, timedelta(days=100))
-        example = "3600s"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "DURATION")
-        self.assertEqual(token.value, timedelta(seconds=3600))
-
-    def test_int(self):
-        """
-        A float is: 1234 or -1234
-        """
-        example = "1234"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "INT")
-        self.assertEqual(token.value, 1234)
-        example = "-1234"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "INT")
-        self.assertEqual(token.value, -1234)
-
-    def test_true(self):
-        """
-        A boolean True is: (case insensitive) True.
-        """
-        example = "True"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "TRUE")
-        self.assertEqual(token.value, True)
-        example = "TRUE"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "TRUE")
-        self.assertEqual(token.value, True)
-
-    def test_false(self):
-        """
-        A boolean False is: (case insensitive) False.
-        """
-        example = "False"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "FALSE")
-        self.assertEqual(token.value, False)
-        example = "FALSE"
-        result = list(self.lexer.tokenize(example))
-        token = result[0]
-        self.assertEqual(token.type, "FALSE")
-        self.assertEqual(token.value, False)
+    def test_scalars(self):
+        """
+        Floats, durations, integers and booleans evaluate to the expected
+        tokens with values of the expected Python type.
+        """
+        for example, token_type, value in self.SCALARS:
+            with self.subTest(example=example):
+                token = self._first(example)
+                self.assertEqual(token.type, token_type)
+                self.assertEqual(token.value, value)
+                self.assertIsInstance(token.value, type(value))
 
     def test_case_insensitive_simple_tokens(self):
         """
@@ -254,48 +288,43 @@ class QueryLexerTestCase(TestCase):
         evaluate to the expected tokens. The literals evaluate to themselves.
         """
         # Case insensitive keywords.
-        keywords = [
-            "HAS",
-            "MISSING",
-            "AND",
-            "OR",
-            "MATCHES",
-            "IMATCHES",
-            "IS",
-            "IIS",
-        ]
-        for k in keywords:
-            result = list(self.lexer.tokenize(k))
-            token = result[0]
+        tokens = list(self.lexer.tokenize(" ".join(self.KEYWORDS)))
+        self.assertEqual(len(tokens), len(self.KEYWORDS))
+        for k, token in zip(self.KEYWORDS, tokens):
             self.assertEqual(token.type, k)
             self.assertEqual(token.value, k)
-            # Works no matter the case.
-            result = list(self.lexer.tokenize(k.lower()))
-            token = result[0]
+        # Works no matter the case.
+        tokens = list(self.lexer.tokenize(" ".join(self.KEYWORDS).lower()))
+        self.assertEqual(len(tokens), len(self.KEYWORDS))
+        for k, token in zip(self.KEYWORDS, tokens):
             self.assertEqual(token.type, k)
             self.assertEqual(token.value, k.lower())
         # Comparisons evaluate to their names.
-        comparisons = {
-            "=": "EQ",
-            "!=": "NE",
-            ">": "GT",
-            "<": "LT",
-            ">=": "GE",
-            "<=": "LE",
-        }
-        for comparison, name in comparisons.items():
-            result = list(self.lexer.tokenize(comparison))
-            token = result[0]
+        comparisons = [c[0] for c in self.COMPARISONS]
+        tokens = list(self.lexer.tokenize(" ".join(comparisons)))
+        self.assertEqual(len(tokens), len(self.COMPARISONS))
+        for (comparison, name), token in zip(self.COMPARISONS, tokens):
             self.assertEqual(token.type, name)
             self.assertEqual(token.value, comparison)
         # Literals always evaluate to themselves.
-        literals = ["(", ")"]
-        for literal in literals:
-            result = list(self.lexer.tokenize(literal))
-            token = result[0]
+        tokens = list(self.lexer.tokenize(" ".join(self.LITERALS)))
+        self.assertEqual(len(tokens), len(self.LITERALS))
+        for literal, token in zip(self.LITERALS, tokens):
             self.assertEqual(token.type, literal)
             self.assertEqual(token.value, literal)
 
+    def test_reset(self):
+        """
+        Resetting the lexer clears the tag paths and line number recorded
+        while tokenizing a previous query.
+        """
+        list(self.lexer.tokenize("\n\nnamespace/tag"))
+        self.assertEqual(self.lexer.tag_paths, {"namespace/tag"})
+        self.assertEqual(self.lexer.lineno, 3)
+        self.lexer.reset()
+        self.assertEqual(self.lexer.tag_paths, set())
+        self.assertEqual(self.lexer.lineno, 1)
+
     def test_ignore_newline(self):
         """
         A newline increments the lineno property of the instance.
@@ -307,8 +336,47 @@ class QueryLexerTestCase(TestCase):
         """
         If there's a syntax error, an exception is thrown.
         """
-        with self.assertRaises(SyntaxError):
+        with self.assertRaises(SyntaxError) as ex:
             list(self.lexer.tokenize("FOO"))
+        msg = ex.exception.args[0]
+        self.assertEqual("Unknown word: line 1, word: FOO", msg)
+        # Keywords must be separated from each other (and from values) by
+        # whitespace or parentheses. The error names the unknown word.
+        for example, word in (
+            ("a/b istrue", "istrue"),
+            ("has a/b andmissing c/d", "andmissing"),
+            ("hasx a/b", "hasx"),
+        ):
+            with self.subTest(example=example):
+                with self.assertRaises(SyntaxError) as ex:
+                    list(self.lexer.tokenize(example))
+                msg = ex.exception.args[0]
+                self.assertEqual(f"Unknown word: line 1, word: {word}", msg)
+        # Durations cannot be negative, and their units are lower case.
+        for example in ("-100d", "10D", "3600S"):
+            with self.subTest(example=example):
+                with self.assertRaises(SyntaxError):
+                    list(self.lexer.tokenize(example))
+        # The letters in datetimes and floats are case sensitive.
+        for example in (
+            "2020-08-19t15:40:30",
+            "2020-08-19T15:40:30z",
+            "1.5E3",
+        ):
+            with self.subTest(example=example):
+                with self.assertRaises(SyntaxError):
+                    list(self.lexer.tokenize(example))
+
+    def test_syntax_error_long_input(self):
+        """
+        The exception is thrown at the first illegal character, rather than
+        after scanning the rest of a (potentially very long) input.
+        """
+        with self.assertRaises(SyntaxError) as ex:
+            list(self.lexer.tokenize("has a/b" + ("@" * 10000)))
+        msg = ex.exception.args[0]
+        self.assertEqual("Unknown token: line 1, character: @", msg)
+        self.assertEqual(self.lexer.index, 7)
 
     def test_complete_queries(self):
         """
@@ -320,47 +388,45 @@ class QueryLexerTestCase(TestCase):
             "(name/tag>=4 or foo/bar is False)"
         )
         tokens = list(self.lexer.tokenize(query))
-        self.assertEqual(tokens[0].type, "HAS")
-        self.assertEqual(tokens[1].type, "PATH")
-        self.assertEqual(tokens[2].type, "AND")
-        self.assertEqual(tokens[3].type, "(")
-        self.assertEqual(tokens[4].type, "PATH")
-        self.assertEqual(tokens[5].type, "GE")
-        self.assertEqual(tokens[6].type, "INT")
-        self.assertEqual(tokens[7].type, "OR")
-        self.assertEqual(tokens[8].type, "PATH")
-        self.assertEqual(tokens[9].type, "IS")
-        self.assertEqual(tokens[10].type, "FALSE")
-        self.assertEqual(tokens[11].type, ")")
+        self.assertListEqual(
+            [t.type for t in tokens],
+            [
+                "HAS",
+                "PATH",
+                "AND",
+                "(",
+                "PATH",
+                "GE",
+                "INT",
+                "OR",
+                "PATH",
+                "IS",
+                "FALSE",
+                ")",
+            ],
+        )
         query = "library/due=2026-08-19 or library/duration > 100d"
         tokens = list(self.lexer.tokenize(query))
-        self.assertEqual(tokens[0].type, "PATH")
-        self.assertEqual(tokens[1].type, "EQ")
-        self.assertEqual(tokens[2].type, "DATETIME")
-        self.assertEqual(tokens[3].type, "OR")
-        self.assertEqual(tokens[4].type, "PATH")
-        self.assertEqual(tokens[5].type, "GT")
-        self.assertEqual(tokens[6].type, "DURATION")
+        self.assertListEqual(
+            [t.type for t in tokens],
+            ["PATH", "EQ", "DATETIME", "OR", "PATH", "GT", "DURATION"],
+        )
         query = 'zoo/animal imatches "Elephant"'
         tokens = list(self.lexer.tokenize(query))
-        self.assertEqual(tokens[0].type, "PATH")
-        self.assertEqual(tokens[1].type, "IMATCHES")
-        self.assertEqual(tokens[2].type, "STRING")
+        self.assertListEqual(
+            [t.type for t in tokens], ["PATH", "IMATCHES", "STRING"]
+        )
         query = "maths/pi != 3.141"  # :-)
         tokens = list(self.lexer.tokenize(query))
-        self.assertEqual(tokens[0].type, "PATH")
-        self.assertEqual(tokens[1].type, "NE")
-        self.assertEqual(tokens[2].type, "FLOAT")
+        self.assertListEqual([t.type for t in tokens], ["PATH", "NE", "FLOAT"])
         query = "gallery/image is image/jpeg"
         tokens = list(self.lexer.tokenize(query))
-        self.assertEqual(tokens[0].type, "PATH")
-        self.assertEqual(tokens[1].type, "IS")
-        self.assertEqual(tokens[2].type, "PATH")
+        self.assertListEqual([t.type for t in tokens], ["PATH", "IS", "PATH"])
         query = 'library/title iis "moby dick"'
         tokens = list(self.lexer.tokenize(query))
-        self.assertEqual(tokens[0].type, "PATH")
-        self.assertEqual(tokens[1].type, "IIS")
-        self.assertEqual(tokens[2].type, "STRING")
+        self.assertListEqual(
+            [t.type for t in tokens], ["PATH", "IIS", "STRING"]
+        )
 
 
 class QueryParserTestCase(TestCase):
@@ -369,84 +435,88 @@ class QueryParserTestCase(TestCase):
     and returns the expected set of matching object_ids given various queries.
     """
 
-    def setUp(self):
-        self.lexer = query.QueryLexer()
-        self.site_admin_user = models.User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.site_admin_user = models.User.objects.create_user(
             username="site_admin_user",
             email="test@user.com",
             password="password",
             is_superuser=True,
         )
-        self.admin_user = models.User.objects.create_user(
+        cls.admin_user = models.User.objects.create_user(
             username="admin_user",
             email="test2@user.com",
             password="password",
         )
-        self.tag_user = models.User.objects.create_user(
+        cls.tag_user = models.User.objects.create_user(
             username="tag_user",
             email="test3@user.com",
             password="password",
         )
-        self.tag_reader = models.User.objects.create_user(
+        cls.tag_reader = models.User.objects.create_user(
             username="tag_reader",
             email="test4@user.com",
             password="password",
         )
-        self.normal_user = models.User.objects.create_user(
+        cls.normal_user = models.User.objects.create_user(
             username="normal_user",
             email="test5@user.com",
             password="password",
         )
-        self.namespace_name = "test_namespace"
-        self.namespace_description = "This is a test namespace."
-        self.test_namespace = logic.create_namespace(
-            self.site_admin_user,
-            self.namespace_name,
-            self.namespace_description,
+        cls.namespace_name = "test_namespace"
+        cls.namespace_description = "This is a test namespace."
+        cls.test_namespace = logic.create_namespace(
+            cls.site_admin_user,
+            cls.namespace_name,
+            cls.namespace_description,
             admins=[
-                self.admin_user,
+                cls.admin_user,
             ],
         )
-        self.public_tag_name = "public_tag"
-        self.public_tag_description = "This is a public tag."
-        self.public_tag_type_of = "s"
-        self.public_tag = logic.create_tag(
-            user=self.site_admin_user,
-            name=self.public_tag_name,
-            description=self.public_tag_description,
-            type_of=self.public_tag_type_of,
-            namespace=self.test_namespace,
+        cls.public_tag_name = "public_tag"
+        cls.public_tag_description = "This is a public tag."
+        cls.public_tag_type_of = "s"
+        cls.public_tag = logic.create_tag(
+            user=cls.site_admin_user,
+            name=cls.public_tag_name,
+            description=cls.public_tag_description,
+            type_of=cls.public_tag_type_of,
+            namespace=cls.test_namespace,
             private=False,
         )
-        self.user_tag_name = "user_tag"
-        self.user_tag_description = "This is a user tag."
-        self.user_tag_type_of = "b"
-        self.user_tag = logic.create_tag(
-            user=self.site_admin_user,
-            name=self.user_tag_name,
-            description=self.user_tag_description,
-            type_of=self.user_tag_type_of,
-            namespace=self.test_namespace,
+        cls.user_tag_name = "user_tag"
+        cls.user_tag_description = "This is a user tag."
+        cls.user_tag_type_of = "b"
+        cls.user_tag = logic.create_tag(
+            user=cls.site_admin_user,
+            name=cls.user_tag_name,
+            description=cls.user_tag_description,
+            type_of=cls.user_tag_type_of,
+            namespace=cls.test_namespace,
             private=True,
             users=[
-                self.tag_user,
+                cls.tag_user,
             ],
         )
-        self.reader_tag_name = "reader_tag"
-        self.reader_tag_description = "This is a reader tag."
-        self.reader_tag_type_of = "i"
-        self.reader_tag = logic.create_tag(
-            user=self.site_admin_user,
-            name=self.reader_tag_name,
-            description=self.reader_tag_description,
-            type_of=self.reader_tag_type_of,
-            namespace=self.test_namespace,
+        cls.reader_tag_name = "reader_tag"
+        cls.reader_tag_description = "This is a reader tag."
+        cls.reader_tag_type_of = "i"
+        cls.reader_tag = logic.create_tag(
+            user=cls.site_admin_user,
+            name=cls.reader_tag_name,
+            description=cls.reader_tag_description,
+            type_of=cls.reader_tag_type_of,
+            namespace=cls.test_namespace,
             private=True,
             readers=[
-                self.tag_reader,
+                cls.tag_reader,
             ],
         )
 
+    def setUp(self):
+        LEXER.reset()
+        self.lexer = LEXER
+
     def test_init_readable_tag(self):
         """
         Ensure that the tagpaths are checked for read permission with the
@@ -506,12 +576,9 @@ class QueryParserTestCase(TestCase):
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
         result = parser._evaluate_query(
             "test_namespace/public_tag",
-            {
-                "string",
-                "url",
-            },
+            STRING_TYPES,
             "MATCHES",
-            Q(value__contains="test"),
+            VALUE_CONTAINS_TEST,
         )
         self.assertEqual(len(result), 1)
         self.assertIn("test_object", result)
@@ -530,12 +597,9 @@ class QueryParserTestCase(TestCase):
         with self.assertRaises(ValueError) as ex:
             parser._evaluate_query(
                 "test_namespace/unknown_tag",
-                {
-                    "string",
-                    "url",
-                },
+                STRING_TYPES,
                 "MATCHES",
-                Q(value__contains="test"),
+                VALUE_CONTAINS_TEST,
             )
         msg = ex.exception.args[0]
         self.assertEqual("Unknown tag: test_namespace/unknown_tag", msg)
@@ -554,9 +618,9 @@ class QueryParserTestCase(TestCase):
         with self.assertRaises(ValueError) as ex:
             parser._evaluate_query(
                 "test_namespace/public_tag",
-                {"int", "float", "datetime", "duration"},
+                NUMERIC_TYPES,
                 "MATCHES",
-                Q(value__contains="test"),
+                VALUE_CONTAINS_TEST,
             )
         msg = ex.exception.args[0]
         expected = (
@@ -574,9 +638,7 @@ class QueryParserTestCase(TestCase):
         )
         val2 = self.user_tag.annotate(self.admin_user, "test_object1", True)
         val3 = self.reader_tag.annotate(self.admin_user, "test_object2", 42)
-        val1.save()
-        val2.save()
-        val3.save()
+        bulk_save(val1, val2, val3)
         tokens = list(
             self.lexer.tokenize(
                 "has test_namespace/public_tag and "
@@ -585,7 +647,7 @@ class QueryParserTestCase(TestCase):
             )
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
 
@@ -600,9 +662,7 @@ class QueryParserTestCase(TestCase):
         val3 = self.public_tag.annotate(
             self.admin_user, "test_object2", "val1"
         )
-        val1.save()
-        val2.save()
-        val3.save()
+        bulk_save(val1, val2, val3)
         tokens = list(
             self.lexer.tokenize(
                 'test_namespace/public_tag is "val1" '
@@ -610,7 +670,7 @@ class QueryParserTestCase(TestCase):
             )
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
 
@@ -626,9 +686,7 @@ class QueryParserTestCase(TestCase):
         val3 = self.public_tag.annotate(
             self.admin_user, "test_object2", "val1"
         )
-        val1.save()
-        val2.save()
-        val3.save()
+        bulk_save(val1, val2, val3)
         tokens = list(
             self.lexer.tokenize(
                 'test_namespace/public_tag is "val1" '
@@ -636,7 +694,7 @@ class QueryParserTestCase(TestCase):
             )
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object2", result)
 
@@ -653,9 +711,7 @@ class QueryParserTestCase(TestCase):
         val3 = self.public_tag.annotate(
             self.admin_user, "test_object3", "val3"
         )
-        val1.save()
-        val2.save()
-        val3.save()
+        bulk_save(val1, val2, val3)
         tokens = list(
             self.lexer.tokenize(
                 'test_namespace/public_tag is "val1" '
@@ -663,7 +719,7 @@ class QueryParserTestCase(TestCase):
             )
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 2)
         self.assertIn("test_object1", result)
         self.assertIn("test_object2", result)
@@ -680,12 +736,10 @@ class QueryParserTestCase(TestCase):
         val3 = self.public_tag.annotate(
             self.admin_user, "test_object3", "another test value"
         )
-        val1.save()
-        val2.save()
-        val3.save()
+        bulk_save(val1, val2, val3)
         tokens = list(self.lexer.tokenize("has test_namespace/public_tag"))
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 2)
         self.assertIn("test_object1", result)
         self.assertIn("test_object3", result)
@@ -717,7 +771,7 @@ class QueryParserTestCase(TestCase):
             self.lexer.tokenize("test_namespace/bin-tag is mime:text/text")
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
 
@@ -742,25 +796,24 @@ class QueryParserTestCase(TestCase):
         annotation2 = self.public_tag.annotate(
             self.admin_user, "test_object2", val2
         )
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         # Check pointer match.
-        lexer = query.QueryLexer()
         tokens1 = list(
-            lexer.tokenize(
+            self.lexer.tokenize(
                 'test_namespace/pointer-tag is "https://ntoll.org/"'
             )
         )
-        parser = query.QueryParser(self.admin_user, lexer.tag_paths)
-        result = parser.parse((x for x in tokens1))
+        parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
+        result = parser.parse(iter(tokens1))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
         # Check string match.
+        self.lexer.reset()
         tokens2 = list(
             self.lexer.tokenize('test_namespace/public_tag is "Hello"')
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens2))
+        result = parser.parse(iter(tokens2))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object2", result)
 
@@ -785,25 +838,24 @@ class QueryParserTestCase(TestCase):
         annotation2 = self.public_tag.annotate(
             self.admin_user, "test_object2", val2
         )
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         # Check pointer match.
-        lexer = query.QueryLexer()
         tokens1 = list(
-            lexer.tokenize(
+            self.lexer.tokenize(
                 'test_namespace/pointer-tag iis "https://NTOLL.ORG/"'
             )
         )
-        parser = query.QueryParser(self.admin_user, lexer.tag_paths)
-        result = parser.parse((x for x in tokens1))
+        parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
+        result = parser.parse(iter(tokens1))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
         # Check string match.
+        self.lexer.reset()
         tokens2 = list(
             self.lexer.tokenize('test_namespace/public_tag iis "helLO"')
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens2))
+        result = parser.parse(iter(tokens2))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object2", result)
 
@@ -828,23 +880,24 @@ class QueryParserTestCase(TestCase):
         annotation2 = self.public_tag.annotate(
             self.admin_user, "test_object2", val2
         )
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         # Check pointer match.
-        lexer = query.QueryLexer()
         tokens1 = list(
-            lexer.tokenize('test_namespace/pointer-tag matches "ntoll.org"')
+            self.lexer.tokenize(
+                'test_namespace/pointer-tag matches "ntoll.org"'
+            )
         )
-        parser = query.QueryParser(self.admin_user, lexer.tag_paths)
-        result = parser.parse((x for x in tokens1))
+        parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
+        result = parser.parse(iter(tokens1))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
         # Check string match.
+        self.lexer.reset()
         tokens2 = list(
             self.lexer.tokenize('test_namespace/public_tag matches "Hello"')
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens2))
+        result = parser.parse(iter(tokens2))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object2", result)
 
@@ -869,23 +922,24 @@ class QueryParserTestCase(TestCase):
         annotation2 = self.public_tag.annotate(
             self.admin_user, "test_object2", val2
         )
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         # Check pointer match.
-        lexer = query.QueryLexer()
         tokens1 = list(
-            lexer.tokenize('test_namespace/pointer-tag imatches "NTOLL.ORG"')
+            self.lexer.tokenize(
+                'test_namespace/pointer-tag imatches "NTOLL.ORG"'
+            )
         )
-        parser = query.QueryParser(self.admin_user, lexer.tag_paths)
-        result = parser.parse((x for x in tokens1))
+        parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
+        result = parser.parse(iter(tokens1))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
         # Check string match.
+        self.lexer.reset()
         tokens2 = list(
             self.lexer.tokenize('test_namespace/public_tag imatches "HELLO"')
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens2))
+        result = parser.parse(iter(tokens2))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object2", result)
 
@@ -908,19 +962,18 @@ class QueryParserTestCase(TestCase):
         annotation2 = boolean_tag.annotate(
             self.admin_user, "test_object2", False
         )
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         # Check False
-        lexer = query.QueryLexer()
-        tokens1 = list(lexer.tokenize("test_namespace/bool-tag is False"))
-        parser = query.QueryParser(self.admin_user, lexer.tag_paths)
-        result = parser.parse((x for x in tokens1))
+        tokens1 = list(self.lexer.tokenize("test_namespace/bool-tag is False"))
+        parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
+        result = parser.parse(iter(tokens1))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object2", result)
         # Check True
+        self.lexer.reset()
         tokens = list(self.lexer.tokenize("test_namespace/bool-tag is true"))
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
 
@@ -938,11 +991,10 @@ class QueryParserTestCase(TestCase):
         )
         annotation1 = int_tag.annotate(self.admin_user, "test_object1", 0)
         annotation2 = int_tag.annotate(self.admin_user, "test_object2", 100)
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         tokens = list(self.lexer.tokenize("test_namespace/int-tag != 100"))
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
 
@@ -964,12 +1016,10 @@ class QueryParserTestCase(TestCase):
         annotation3 = float_tag.annotate(
             self.admin_user, "test_object3", -1.23
         )
-        annotation1.save()
-        annotation2.save()
-        annotation3.save()
+        bulk_save(annotation1, annotation2, annotation3)
         tokens = list(self.lexer.tokenize("test_namespace/float-tag >= 0.0"))
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 2)
         self.assertIn("test_object1", result)
         self.assertIn("test_object2", result)
@@ -1002,14 +1052,12 @@ class QueryParserTestCase(TestCase):
             "test_object3",
             datetime(2021, 8, 19, tzinfo=timezone.utc),
         )
-        annotation1.save()
-        annotation2.save()
-        annotation3.save()
+        bulk_save(annotation1, annotation2, annotation3)
         tokens = list(
             self.lexer.tokenize("test_namespace/dt-tag <= 2020-08-19")
         )
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 2)
         self.assertIn("test_object1", result)
         self.assertIn("test_object2", result)
@@ -1032,11 +1080,10 @@ class QueryParserTestCase(TestCase):
         annotation2 = dur_tag.annotate(
             self.admin_user, "test_object2", timedelta(days=1024)
         )
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         tokens = list(self.lexer.tokenize("test_namespace/dur-tag > 100d"))
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object2", result)
 
@@ -1054,11 +1101,10 @@ class QueryParserTestCase(TestCase):
         )
         annotation1 = int_tag.annotate(self.admin_user, "test_object1", 0)
         annotation2 = int_tag.annotate(self.admin_user, "test_object2", 100)
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         tokens = list(self.lexer.tokenize("test_namespace/int-tag < 100"))
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object1", result)
 
@@ -1076,11 +1122,10 @@ class QueryParserTestCase(TestCase):
         )
         annotation1 = int_tag.annotate(self.admin_user, "test_object1", 0)
         annotation2 = int_tag.annotate(self.admin_user, "test_object2", 100)
-        annotation1.save()
-        annotation2.save()
+        bulk_save(annotation1, annotation2)
         tokens = list(self.lexer.tokenize("test_namespace/int-tag = 100"))
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
-        result = parser.parse((x for x in tokens))
+        result = parser.parse(iter(tokens))
         self.assertEqual(len(result), 1)
         self.assertIn("test_object2", result)
 
@@ -1092,7 +1137,7 @@ class QueryParserTestCase(TestCase):
         tokens = list(self.lexer.tokenize("test_namespace/public_tag and 100"))
         parser = query.QueryParser(self.admin_user, self.lexer.tag_paths)
         with self.assertRaises(SyntaxError) as ex:
-            parser.parse((x for x in tokens))
+            parser.parse(iter(tokens))
         msg = ex.exception.args[0]
         self.assertEquals(
             'Cannot parse AND (with value "and") on line 1, character 26.', msg
@@ -1105,81 +1150,81 @@ class EvaluateTestCase(TestCase):
     expected errors.
     """
 
-    def setUp(self):
-        self.lexer = query.QueryLexer()
-        self.site_admin_user = models.User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.site_admin_user = models.User.objects.create_user(
             username="site_admin_user",
             email="test@user.com",
             password="password",
             is_superuser=True,
         )
-        self.admin_user = models.User.objects.create_user(
+        cls.admin_user = models.User.objects.create_user(
             username="admin_user",
             email="test2@user.com",
             password="password",
         )
-        self.tag_user = models.User.objects.create_user(
+        cls.tag_user = models.User.objects.create_user(
             username="tag_user",
             email="test3@user.com",
             password="password",
         )
-        self.tag_reader = models.User.objects.create_user(
+        cls.tag_reader = models.User.objects.create_user(
             username="tag_reader",
             email="test4@user.com",
             password="password",
         )
-        self.normal_user = models.User.objects.create_user(
+        cls.normal_user = models.User.objects.create_user(
             username="normal_user",
             email="test5@user.com",
             password="password",
         )
-        self.namespace_name = "test_namespace"
-        self.namespace_description = "This is a test namespace."
-        self.test_namespace = logic.create_namespace(
-            self.site_admin_user,
-            self.namespace_name,
-            self.namespace_description,
+        cls.namespace_name = "test_namespace"
+        cls.namespace_description = "This is a test namespace."
+        cls.test_namespace = logic.create_namespace(
+            cls.site_admin_user,
+            cls.namespace_name,
+            cls.namespace_description,
             admins=[
-                self.admin_user,
+                cls.admin_user,
             ],
         )
-        self.public_tag_name = "public_tag"
-        self.public_tag_description = "This is a public tag."
-        self.public_tag_type_of = "s"
-        self.public_tag = logic.create_tag(
-            user=self.site_admin_user,
-            name=self.public_tag_name,
-            description=self.public_tag_description,
-            type_of=self.public_tag_type_of,
-            namespace=self.test_namespace,
+        cls.public_tag_name = "public_tag"
+        cls.public_tag_description = "This is a public tag."
+        cls.public_tag_type_of = "s"
+        cls.public_tag = logic.create_tag(
+            user=cls.site_admin_user,
+            name=cls.public_tag_name,
+            description=cls.public_tag_description,
+            type_of=cls.public_tag_type_of,
+            namespace=cls.test_namespace,
             private=False,
         )
-        self.user_tag_name = "user_tag"
-        self.user_tag_description = "This is a user tag."
-        self.user_tag_type_of = "b"
-        self.user_tag = logic.create_tag(
-            user=self.site_admin_user,
-            name=self.user_tag_name,
-            description=self.user_tag_description,
-            type_of=self.user_tag_type_of,
-            namespace=self.test_namespace,
+        cls.user_tag_name = "user_tag"
+        cls.user_tag_description = "This is a user tag."
+        cls.user_tag_type_of = "b"
+        cls.user_tag = logic.create_tag(
+            user=cls.site_admin_user,
+            name=cls.user_tag_name,
+            description=cls.user_tag_description,
+            type_of=cls.user_tag_type_of,
+            namespace=cls.test_namespace,
             private=True,
             users=[
-                self.tag_user,
+                cls.tag_user,
             ],
         )
-        self.reader_tag_name = "reader_tag"
-        self.reader_tag_description = "This is a reader tag."
-        self.reader_tag_type_of = "i"
-        self.reader_tag = logic.create_tag(
-            user=self.site_admin_user,
-            name=self.reader_tag_name,
-            description=self.reader_tag_description,
-            type_of=self.reader_tag_type_of,
-            namespace=self.test_namespace,
+        cls.reader_tag_name = "reader_tag"
+        cls.reader_tag_description = "This is a reader tag."
+        cls.reader_tag_type_of = "i"
+        cls.reader_tag = logic.create_tag(
+            user=cls.site_admin_user,
+            name=cls.reader_tag_name,
+            description=cls.reader_tag_description,
+            type_of=cls.reader_tag_type_of,
+            namespace=cls.test_namespace,
             private=True,
             readers=[
-                self.tag_reader,
+                cls.tag_reader,
             ],
         )
 
@@ -1192,9 +1237,7 @@ class EvaluateTestCase(TestCase):
         )
         val2 = self.user_tag.annotate(self.admin_user, "test_object1", True)
         val3 = self.reader_tag.annotate(self.admin_user, "test_object2", 42)
-        val1.save()
-        val2.save()
-        val3.save()
+        bulk_save(val1, val2, val3)
         q = (
             "has test_namespace/public_tag and "
             "(test_namespace/reader_tag = 42 or "